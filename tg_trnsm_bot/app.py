@@ -1,20 +1,28 @@
 import asyncio
 import logging
 import re
+import signal
+import tempfile
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Literal
+from pathlib import Path
+from typing import Any, Literal
 
-from telegram import Update
-from telegram.error import BadRequest
+import transmission_rpc as trans
+from telegram import Bot, CallbackQuery, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest, TelegramError
 from telegram.ext import (
+    AIORateLimiter,
     Application,
     CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
+    Job,
     MessageHandler,
     filters,
 )
-from telegram.helpers import escape_markdown
 from transmission_rpc.error import TransmissionError
 
 from tg_trnsm_bot import config, menus, utils
@@ -24,16 +32,56 @@ logger = logging.getLogger(__name__)
 
 AUTO_UPDATE_INTERVAL_SEC = 1
 AUTO_UPDATE_DURATION_SEC = 60
-AUTO_UPDATE_STATUSES = {"downloading", "seeding", "checking"}
-ACTIONS_REQUIRING_AUTO_UPDATE = {"start", "verify"}
+AUTO_UPDATE_STATUSES = frozenset(
+    {"check pending", "checking", "download pending", "downloading", "seed pending", "seeding"}
+)
+ACTIONS_REQUIRING_AUTO_UPDATE = frozenset({"start", "verify"})
+UPDATE_JOB_NAME = "torrent_updates"
+LONG_POLLING_TIMEOUT_SEC = 50
+RATE_LIMITER_MAX_RETRIES = 3
+LAST_RENDERED_MESSAGES_MAX_SIZE = 1024
+TORRENT_REMOVAL_POLL_DELAYS_SEC = (0.02, 0.04, 0.08)
 
 MAGNET_PATTERN = re.compile(r"magnet:\?xt=urn:btih:[^\s]+")
 TORRENT_URL_PATTERN = re.compile(r"https?://[^\s]+\.torrent\b", re.IGNORECASE)
+# lets only messages containing a link reach `text_message_handler`, other chat text is dropped silently
+TORRENT_LINK_PATTERN = re.compile(rf"{MAGNET_PATTERN.pattern}|(?i:{TORRENT_URL_PATTERN.pattern})")
 
 monitored_torrents: dict[int, dict[str, str | float]] = {}
+# (chat_id, message_id) -> last (text, reply_markup) sent to the message, oldest first
+last_rendered_messages: OrderedDict[tuple[int, int], tuple[str, InlineKeyboardMarkup | None]] = OrderedDict()
 _monitor_initialized = False
 
 TorrentAction = Literal["view", "start", "stop", "verify", "reload"]
+# action -> (call performing it and returning the refreshed torrent, callback answer)
+TORRENT_ACTIONS: dict[str, tuple[Callable[[int], trans.Torrent], str]] = {
+    "start": (menus.start_torrent, "Started"),
+    "stop": (menus.stop_torrent, "Stopped"),
+    "verify": (menus.verify_torrent, "Verifying"),
+}
+MessageKey = tuple[int, int]
+
+
+@dataclass(frozen=True, slots=True)
+class CallbackData:
+    """
+    Parsed `<command>_<value>[_<arg>[_<extra>]]` callback data
+    """
+
+    command: str
+    value: int
+    arg: str | None = None
+    extra: str | None = None
+
+    @classmethod
+    def parse(cls, data: str) -> CallbackData:
+        command, _, rest = data.partition("_")
+        value, _, rest = rest.partition("_")
+        arg, _, extra = rest.partition("_")
+        return cls(command=command, value=int(value), arg=arg or None, extra=extra or None)
+
+
+CallbackQueryHandlerFunc = Callable[[Update, ContextTypes.DEFAULT_TYPE, CallbackData], Awaitable[None]]
 
 
 @dataclass(frozen=True, slots=True)
@@ -42,60 +90,204 @@ class TorrentCallback:
     action: TorrentAction = "view"
 
     @classmethod
-    def parse(cls, data: str) -> TorrentCallback:
-        parts = data.split("_")
-        return cls(
-            torrent_id=int(parts[1]),
-            action=parts[2] if len(parts) == 3 else "view",
-        )
+    def from_callback(cls, cb: CallbackData) -> TorrentCallback:
+        return cls(torrent_id=cb.value, action=cb.arg or "view")
 
 
-def get_job_name(chat_id: int, message_id: int) -> str:
-    return f"torrent_update_{chat_id}_{message_id}"
+def is_torrent_active(torrent: trans.Torrent) -> bool:
+    """
+    Whether the torrent menu can still change: a seeding torrent nobody is downloading from is idle
+    """
+    if torrent.status not in AUTO_UPDATE_STATUSES:
+        return False
+    return torrent.status != "seeding" or torrent.rate_upload > 0 or torrent.rate_download > 0
 
 
-def cancel_torrent_update_job(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int) -> None:
-    job_name = get_job_name(chat_id, message_id)
-    jobs = context.job_queue.get_jobs_by_name(job_name)
-    for job in jobs:
+def get_watchers(context: ContextTypes.DEFAULT_TYPE) -> dict[int, dict[MessageKey, int]]:
+    """
+    Returns torrent_id -> {(chat_id, message_id): iteration} of messages being auto-updated
+    """
+    watchers: dict[int, dict[MessageKey, int]] = context.bot_data.setdefault("watchers", {})
+    return watchers
+
+
+def get_watched_messages(context: ContextTypes.DEFAULT_TYPE) -> dict[MessageKey, int]:
+    """
+    Returns (chat_id, message_id) -> torrent_id, the reverse index of `get_watchers`
+    """
+    watched_messages: dict[MessageKey, int] = context.bot_data.setdefault("watched_messages", {})
+    return watched_messages
+
+
+def remove_update_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    job: Job[Any] | None = context.bot_data.pop("update_job", None)
+    if job is not None:
         job.schedule_removal()
 
 
-async def update_torrent_status(context: ContextTypes.DEFAULT_TYPE) -> None:
-    job = context.job
-    if job is None or not isinstance(job.data, dict):
+def cancel_torrent_update_job(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int) -> None:
+    key = (chat_id, message_id)
+    torrent_id = get_watched_messages(context).pop(key, None)
+    if torrent_id is None:
         return
 
-    data: dict[str, int] = job.data
-    chat_id: int = data["chat_id"]
-    message_id: int = data["message_id"]
-    torrent_id: int = data["torrent_id"]
+    watchers = get_watchers(context)
+    subscribers = watchers.get(torrent_id, {})
+    subscribers.pop(key, None)
+    if not subscribers:
+        watchers.pop(torrent_id, None)
+    if not watchers:
+        remove_update_job(context)
 
-    data["iteration"] += 1
-    elapsed = data["iteration"] * AUTO_UPDATE_INTERVAL_SEC
 
-    try:
-        status = menus.get_torrent_status(torrent_id)
-    except KeyError:
-        job.schedule_removal()
+def schedule_torrent_update(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int, torrent_id: int) -> None:
+    cancel_torrent_update_job(context, chat_id, message_id)
+    key = (chat_id, message_id)
+    get_watchers(context).setdefault(torrent_id, {})[key] = 0
+    get_watched_messages(context)[key] = torrent_id
+
+    if "update_job" in context.bot_data:
         return
+    # one job polls every watched torrent, so the RPC load doesn't grow with the number of open menus
+    context.bot_data["update_job"] = context.job_queue.run_repeating(
+        update_torrent_status,
+        interval=AUTO_UPDATE_INTERVAL_SEC,
+        first=AUTO_UPDATE_INTERVAL_SEC,
+        name=UPDATE_JOB_NAME,
+        job_kwargs={"coalesce": True, "max_instances": 1},
+    )
 
-    should_stop = status not in AUTO_UPDATE_STATUSES or elapsed >= AUTO_UPDATE_DURATION_SEC
-    remaining: int | None = None if should_stop else AUTO_UPDATE_DURATION_SEC - elapsed
-    if should_stop:
-        job.schedule_removal()
 
+async def safe_edit(
+    bot: Bot,
+    chat_id: int,
+    message_id: int,
+    text: str,
+    reply_markup: InlineKeyboardMarkup | None = None,
+    parse_mode: str | None = "MarkdownV2",
+) -> bool:
+    """
+    Edits the message unless it already shows the same content, only the keyboard is sent when the text
+    is unchanged. Returns whether the message was changed
+    """
+    key = (chat_id, message_id)
+    content = (text, reply_markup)
+    previous = last_rendered_messages.get(key)
+    if previous == content:
+        last_rendered_messages.move_to_end(key)
+        return False
+
+    edited = True
     try:
-        text, reply_markup = menus.torrent_menu(torrent_id, auto_refresh_remaining=remaining)
-        await context.bot.edit_message_text(
-            chat_id=chat_id,
-            message_id=message_id,
-            text=text,
-            reply_markup=reply_markup,
-            parse_mode="MarkdownV2",
-        )
-    except BadRequest:
-        pass
+        if previous is not None and previous[0] == text:
+            await bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=reply_markup)
+        else:
+            await bot.edit_message_text(
+                chat_id=chat_id,
+                message_id=message_id,
+                text=text,
+                reply_markup=reply_markup,
+                parse_mode=parse_mode,
+            )
+    except BadRequest as exc:
+        if not exc.message.startswith("Message is not modified"):
+            raise
+        edited = False
+
+    last_rendered_messages[key] = content
+    last_rendered_messages.move_to_end(key)
+    if len(last_rendered_messages) > LAST_RENDERED_MESSAGES_MAX_SIZE:
+        last_rendered_messages.popitem(last=False)
+    return edited
+
+
+async def safe_edit_query(
+    query: CallbackQuery,
+    text: str,
+    reply_markup: InlineKeyboardMarkup | None = None,
+    parse_mode: str | None = "MarkdownV2",
+) -> bool:
+    return await safe_edit(
+        query.get_bot(), query.message.chat_id, query.message.message_id, text, reply_markup, parse_mode
+    )
+
+
+async def edit_torrent_status(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    message_id: int,
+    text: str,
+    reply_markup: InlineKeyboardMarkup,
+) -> None:
+    try:
+        await safe_edit(context.bot, chat_id, message_id, text, reply_markup)
+    except BadRequest as exc:
+        # the message is gone or can't be edited anymore, stop updating it
+        logger.warning(f"Failed to update torrent status in {chat_id}/{message_id}: {exc.message}")
+        cancel_torrent_update_job(context, chat_id, message_id)
+    except TelegramError as exc:
+        # flood control or network trouble only costs this tick, the other edits of the batch still go out
+        logger.warning(f"Skipped torrent status update in {chat_id}/{message_id}: {exc.message}")
+
+
+async def update_torrent_status(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Polls all watched torrents in one request and fans the rendered statuses out to the messages watching them
+    """
+    torrent_ids = list(get_watchers(context))
+    if not torrent_ids:
+        remove_update_job(context)
+        return
+
+    executor: ThreadPoolExecutor = context.bot_data["rpc_executor"]
+    torrents = await asyncio.get_running_loop().run_in_executor(
+        executor, menus.fetch_torrents, torrent_ids, menus.TORRENT_MENU_FIELDS
+    )
+    torrents_by_id = {torrent.id: torrent for torrent in torrents}
+    # torrent_id -> (rendered fields, text): the text is re-rendered only when one of its fields changed
+    previous_texts: dict[int, tuple[tuple[Any, ...], str]] = context.bot_data.get("torrent_texts", {})
+    texts: dict[int, tuple[tuple[Any, ...], str]] = {}
+
+    edits = []
+    for torrent_id in torrent_ids:
+        # re-read subscribers: handlers may have changed them while the torrents were being fetched
+        subscribers = get_watchers(context).get(torrent_id, {})
+        torrent = torrents_by_id.get(torrent_id)
+        if torrent is None:
+            for chat_id, message_id in list(subscribers):
+                cancel_torrent_update_job(context, chat_id, message_id)
+            continue
+
+        snapshot = tuple(torrent.fields.get(field) for field in menus.TORRENT_MENU_FIELDS)
+        previous = previous_texts.get(torrent_id)
+        text = previous[1] if previous is not None and previous[0] == snapshot else menus.torrent_menu_text(torrent)
+        texts[torrent_id] = (snapshot, text)
+
+        is_active = is_torrent_active(torrent)
+        is_stopped = torrent.status == "stopped"
+        for (chat_id, message_id), iteration in list(subscribers.items()):
+            elapsed = (iteration + 1) * AUTO_UPDATE_INTERVAL_SEC
+            remaining: int | None = None
+            if is_active and elapsed < AUTO_UPDATE_DURATION_SEC:
+                remaining = AUTO_UPDATE_DURATION_SEC - elapsed
+                subscribers[(chat_id, message_id)] = iteration + 1
+            else:
+                cancel_torrent_update_job(context, chat_id, message_id)
+
+            reply_markup = menus.torrent_menu_keyboard(torrent_id, is_stopped, remaining)
+            edits.append(edit_torrent_status(context, chat_id, message_id, text, reply_markup))
+    context.bot_data["torrent_texts"] = texts
+    await asyncio.gather(*edits)
+
+
+async def fall_back_to_torrent_list(query: CallbackQuery) -> None:
+    """
+    Shows the torrent list in place of a menu whose torrent was removed
+    """
+    _, (text, reply_markup) = await asyncio.gather(
+        query.answer(text="Torrent no longer exists"), asyncio.to_thread(menus.get_torrents)
+    )
+    await safe_edit_query(query, text, reply_markup)
 
 
 @utils.whitelist
@@ -112,271 +304,223 @@ async def add(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 @utils.whitelist
 async def memory(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    formatted_memory = menus.get_memory()
+    formatted_memory = await asyncio.to_thread(menus.get_memory)
     await update.message.reply_text(formatted_memory)
 
 
 @utils.whitelist
 async def get_torrents_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    torrent_list, keyboard = menus.get_torrents()
+    torrent_list, keyboard = await asyncio.to_thread(menus.get_torrents)
     await update.message.reply_text(torrent_list, reply_markup=keyboard, parse_mode="MarkdownV2")
 
 
-@utils.whitelist
-async def get_torrents_inline(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def get_torrents_inline(update: Update, context: ContextTypes.DEFAULT_TYPE, cb: CallbackData) -> None:
     query = update.callback_query
-    callback = query.data.split("_")
-    start_point = int(callback[1])
     cancel_torrent_update_job(context, query.message.chat_id, query.message.message_id)
-    torrent_list, keyboard = menus.get_torrents(start_point)
-    if len(callback) == 3 and callback[2] == "reload":
-        try:
-            await query.edit_message_text(text=torrent_list, reply_markup=keyboard, parse_mode="MarkdownV2")
-            await query.answer(text="Reloaded")
-        except BadRequest:
-            await query.answer(text="Nothing to reload")
+    torrent_list, keyboard = await asyncio.to_thread(menus.get_torrents, cb.value)
+    if cb.arg == "reload":
+        edited = await safe_edit_query(query, torrent_list, keyboard)
+        await query.answer(text="Reloaded" if edited else "Nothing to reload")
     else:
-        await query.answer()
-        await query.edit_message_text(text=torrent_list, reply_markup=keyboard, parse_mode="MarkdownV2")
+        await asyncio.gather(query.answer(), safe_edit_query(query, torrent_list, keyboard))
 
 
-@utils.whitelist
-async def torrent_menu_inline(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def torrent_menu_inline(update: Update, context: ContextTypes.DEFAULT_TYPE, cb: CallbackData) -> None:
     query = update.callback_query
-    cb = TorrentCallback.parse(query.data)
+    torrent_cb = TorrentCallback.from_callback(cb)
     chat_id = query.message.chat_id
     message_id = query.message.message_id
 
-    if cb.action == "start":
-        menus.start_torrent(cb.torrent_id)
-        await query.answer(text="Started")
-    elif cb.action == "stop":
-        menus.stop_torrent(cb.torrent_id)
-        await query.answer(text="Stopped")
-    elif cb.action == "verify":
-        menus.verify_torrent(cb.torrent_id)
-        await query.answer(text="Verifying")
-
+    action = TORRENT_ACTIONS.get(torrent_cb.action)
+    answer_text: str | None = None
     try:
-        status = menus.get_torrent_status(cb.torrent_id)
+        if action is None:
+            torrent = await asyncio.to_thread(menus.get_torrent, torrent_cb.torrent_id, menus.TORRENT_MENU_FIELDS)
+        else:
+            perform, answer_text = action
+            torrent = await asyncio.to_thread(perform, torrent_cb.torrent_id)
     except KeyError:
-        await query.answer(text="Torrent no longer exists")
         cancel_torrent_update_job(context, chat_id, message_id)
-        text, reply_markup = menus.get_torrents()
-        await query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
+        await fall_back_to_torrent_list(query)
         return
 
-    should_auto_update = status in AUTO_UPDATE_STATUSES or cb.action in ACTIONS_REQUIRING_AUTO_UPDATE
+    should_auto_update = is_torrent_active(torrent) or torrent_cb.action in ACTIONS_REQUIRING_AUTO_UPDATE
     auto_refresh_remaining = AUTO_UPDATE_DURATION_SEC if should_auto_update else None
-    text, reply_markup = menus.torrent_menu(cb.torrent_id, auto_refresh_remaining=auto_refresh_remaining)
+    text, reply_markup = menus.torrent_menu(
+        torrent_cb.torrent_id, auto_refresh_remaining=auto_refresh_remaining, torrent=torrent
+    )
 
     cancel_torrent_update_job(context, chat_id, message_id)
 
-    if cb.action == "reload":
-        try:
-            await query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
-            await query.answer(text="Reloaded")
-        except BadRequest:
-            await query.answer(text="Nothing to reload")
+    if torrent_cb.action == "reload":
+        edited = await safe_edit_query(query, text, reply_markup)
+        await query.answer(text="Reloaded" if edited else "Nothing to reload")
     else:
-        await query.answer()
-        try:
-            await query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
-        except BadRequest as exc:
-            if not str(exc).startswith("Message is not modified"):
-                raise
+        await asyncio.gather(query.answer(text=answer_text), safe_edit_query(query, text, reply_markup))
 
     if should_auto_update:
-        context.job_queue.run_repeating(
-            update_torrent_status,
-            interval=AUTO_UPDATE_INTERVAL_SEC,
-            first=AUTO_UPDATE_INTERVAL_SEC,
-            data={"chat_id": chat_id, "message_id": message_id, "torrent_id": cb.torrent_id, "iteration": 0},
-            name=get_job_name(chat_id, message_id),
-        )
+        schedule_torrent_update(context, chat_id, message_id, torrent_cb.torrent_id)
 
 
-@utils.whitelist
-async def torrent_files_inline(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def torrent_files_inline(update: Update, context: ContextTypes.DEFAULT_TYPE, cb: CallbackData) -> None:
     query = update.callback_query
-    callback = query.data.split("_")
-    torrent_id = int(callback[1])
     cancel_torrent_update_job(context, query.message.chat_id, query.message.message_id)
     try:
-        text, reply_markup = menus.get_files(torrent_id)
+        text, reply_markup = await asyncio.to_thread(menus.get_files, cb.value)
     except KeyError:
-        await query.answer(text="Torrent no longer exists")
-        text, reply_markup = menus.get_torrents()
-        await query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
+        await fall_back_to_torrent_list(query)
     else:
-        if len(callback) == 3 and callback[2] == "reload":
-            try:
-                await query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
-                await query.answer(text="Reloaded")
-            except BadRequest:
-                await query.answer(text="Nothing to reload")
+        if cb.arg == "reload":
+            edited = await safe_edit_query(query, text, reply_markup)
+            await query.answer(text="Reloaded" if edited else "Nothing to reload")
         else:
-            await query.answer()
-            await query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
+            await asyncio.gather(query.answer(), safe_edit_query(query, text, reply_markup))
 
 
-@utils.whitelist
-async def delete_torrent_inline(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def delete_torrent_inline(update: Update, context: ContextTypes.DEFAULT_TYPE, cb: CallbackData) -> None:
     query = update.callback_query
-    callback = query.data.split("_")
-    torrent_id = int(callback[1])
     cancel_torrent_update_job(context, query.message.chat_id, query.message.message_id)
     try:
-        text, reply_markup = menus.delete_menu(torrent_id)
+        text, reply_markup = await asyncio.to_thread(menus.delete_menu, cb.value)
     except KeyError:
-        await query.answer(text="Torrent no longer exists")
-        text, reply_markup = menus.get_torrents()
-        await query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
+        await fall_back_to_torrent_list(query)
     else:
-        await query.answer()
-        await query.edit_message_text(text=text, reply_markup=reply_markup)
+        await asyncio.gather(query.answer(), safe_edit_query(query, text, reply_markup, parse_mode=None))
 
 
-@utils.whitelist
-async def delete_torrent_action_inline(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def wait_torrent_removed(torrent_id: int) -> None:
+    """
+    Transmission removes torrents asynchronously, so wait until the torrent is gone from the list
+    """
+    for delay in TORRENT_REMOVAL_POLL_DELAYS_SEC:
+        try:
+            await asyncio.to_thread(menus.get_torrent, torrent_id, ["id"])
+        except KeyError:
+            break
+        await asyncio.sleep(delay)
+    # a list fetched while Transmission was still removing the torrent may have been cached meanwhile
+    menus.invalidate_torrent_list()
+
+
+def get_chat_lock(context: ContextTypes.DEFAULT_TYPE) -> asyncio.Lock:
+    """
+    Returns the lock serializing callback handling and list refreshes within a chat
+    """
+    lock: asyncio.Lock = context.chat_data.setdefault("callback_lock", asyncio.Lock())
+    return lock
+
+
+async def refresh_list_after_delete(query: CallbackQuery, lock: asyncio.Lock, torrent_id: int) -> None:
+    # serialized per chat, so refreshes from quick successive deletes can't overtake each other
+    async with lock:
+        await wait_torrent_removed(torrent_id)
+        torrent_list, keyboard = await asyncio.to_thread(menus.get_torrents)
+        if torrent_list == "Nothing to display":
+            await query.delete_message()
+            last_rendered_messages.pop((query.message.chat_id, query.message.message_id), None)
+        else:
+            await safe_edit_query(query, torrent_list, keyboard)
+
+
+async def delete_torrent_action_inline(update: Update, context: ContextTypes.DEFAULT_TYPE, cb: CallbackData) -> None:
     query = update.callback_query
-    callback = query.data.split("_")
-    torrent_id = int(callback[1])
     cancel_torrent_update_job(context, query.message.chat_id, query.message.message_id)
-    if len(callback) == 3 and callback[2] == "data":
-        menus.delete_torrent(torrent_id, True)
-    else:
-        menus.delete_torrent(torrent_id)
+    await asyncio.to_thread(menus.delete_torrent, cb.value, cb.arg == "data")
     await query.answer(text="Deleted")
-    await asyncio.sleep(0.1)
-    torrent_list, keyboard = menus.get_torrents()
-    if torrent_list == "Nothing to display":
-        await query.delete_message()
-    else:
-        await query.edit_message_text(text=torrent_list, reply_markup=keyboard, parse_mode="MarkdownV2")
+    # the list is refreshed in the background, so the handler returns as soon as the user is answered
+    context.application.create_task(refresh_list_after_delete(query, get_chat_lock(context), cb.value), update=update)
 
 
 @utils.whitelist
 async def torrent_file_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     file = await context.bot.get_file(update.message.document)
-    file_bytes = await file.download_as_bytearray()
     try:
-        torrent = menus.add_torrent_with_file(file_bytes)
+        # spool the file to disk instead of holding a bytearray next to the base64 copy sent to Transmission
+        with tempfile.NamedTemporaryFile(suffix=".torrent") as tmp:
+            await file.download_to_drive(tmp.name)
+            torrent = await asyncio.to_thread(menus.add_torrent_with_file, Path(tmp.name))
     except TransmissionError as e:
         await update.message.reply_text(f"Failed to add torrent: {e}", do_quote=True)
     else:
-        await update.message.reply_text("Torrent added", do_quote=True)
-        text, reply_markup = menus.add_menu(torrent.id)
+        # the add menu is rendered while the confirmation is in flight; the menu itself is sent
+        # afterwards so the messages keep their order in the chat
+        _, (text, reply_markup) = await asyncio.gather(
+            update.message.reply_text("Torrent added", do_quote=True),
+            asyncio.to_thread(menus.add_menu, torrent.id),
+        )
         await update.message.reply_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
 
 
-@utils.whitelist
-async def magnet_url_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if update.message is None or update.message.text is None:
-        return
-    magnet_urls = MAGNET_PATTERN.findall(update.message.text)
-    for magnet_url in magnet_urls:
+async def add_torrents_from_links(update: Update, links: list[str], add: Callable[[str], trans.Torrent]) -> None:
+    for link in links:
         try:
-            torrent = menus.add_torrent_with_magnet(magnet_url)
+            torrent = await asyncio.to_thread(add, link)
         except TransmissionError as e:
             await update.message.reply_text(f"Failed to add torrent: {e}", do_quote=True)
             continue
-        text, reply_markup = menus.add_menu(torrent.id)
+
+        text, reply_markup = await asyncio.to_thread(menus.add_menu, torrent.id)
         await update.message.reply_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
 
 
 @utils.whitelist
-async def torrent_url_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Adds the magnet links found in the message, or the .torrent URLs if there are none
+    """
     if update.message is None or update.message.text is None:
         return
-    torrent_urls = TORRENT_URL_PATTERN.findall(update.message.text)
-    for torrent_url in torrent_urls:
-        try:
-            torrent = menus.add_torrent_with_url(torrent_url)
-        except TransmissionError as e:
-            await update.message.reply_text(f"Failed to add torrent: {e}", do_quote=True)
-            continue
-
-        text, reply_markup = menus.add_menu(torrent.id)
-        await update.message.reply_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
+    text = update.message.text
+    if magnet_urls := MAGNET_PATTERN.findall(text):
+        await add_torrents_from_links(update, magnet_urls, menus.add_torrent_with_magnet)
+    elif torrent_urls := TORRENT_URL_PATTERN.findall(text):
+        await add_torrents_from_links(update, torrent_urls, menus.add_torrent_with_url)
 
 
-@utils.whitelist
-async def torrent_adding_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def torrent_adding_actions(update: Update, context: ContextTypes.DEFAULT_TYPE, cb: CallbackData) -> None:
     query = update.callback_query
-    callback = query.data.split("_")
-    if len(callback) == 3:
-        torrent_id = int(callback[1])
-        if callback[2] == "start":
-            menus.start_torrent(torrent_id)
-            text, reply_markup = menus.torrent_menu(torrent_id, auto_refresh_remaining=AUTO_UPDATE_DURATION_SEC)
-            await query.answer(text="Started")
-            await query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
-            context.job_queue.run_repeating(
-                update_torrent_status,
-                interval=AUTO_UPDATE_INTERVAL_SEC,
-                first=AUTO_UPDATE_INTERVAL_SEC,
-                data={
-                    "chat_id": query.message.chat_id,
-                    "message_id": query.message.message_id,
-                    "torrent_id": torrent_id,
-                    "iteration": 0,
-                },
-                name=get_job_name(query.message.chat_id, query.message.message_id),
-            )
-        elif callback[2] == "cancel":
-            menus.delete_torrent(torrent_id, True)
-            await query.answer(text="Canceled")
-            await query.edit_message_text("Torrent deleted")
+    if cb.arg == "start":
+        torrent = await asyncio.to_thread(menus.start_torrent, cb.value)
+        text, reply_markup = menus.torrent_menu(
+            cb.value, auto_refresh_remaining=AUTO_UPDATE_DURATION_SEC, torrent=torrent
+        )
+        await asyncio.gather(query.answer(text="Started"), safe_edit_query(query, text, reply_markup))
+        schedule_torrent_update(context, query.message.chat_id, query.message.message_id, cb.value)
+    elif cb.arg == "cancel":
+        await asyncio.to_thread(menus.delete_torrent, cb.value, True)
+        await asyncio.gather(query.answer(text="Canceled"), safe_edit_query(query, "Torrent deleted", parse_mode=None))
 
 
-@utils.whitelist
-async def torrent_adding(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def torrent_adding(update: Update, context: ContextTypes.DEFAULT_TYPE, cb: CallbackData) -> None:
     query = update.callback_query
-    callback = query.data.split("_")
-    torrent_id = int(callback[1])
-    text, reply_markup = menus.add_menu(torrent_id)
-    await query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
+    text, reply_markup = await asyncio.to_thread(menus.add_menu, cb.value)
+    await asyncio.gather(query.answer(), safe_edit_query(query, text, reply_markup))
 
 
-@utils.whitelist
-async def edit_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def edit_file(update: Update, context: ContextTypes.DEFAULT_TYPE, cb: CallbackData) -> None:
     query = update.callback_query
-    callback = query.data.split("_")
-    torrent_id = int(callback[1])
-    file_id = int(callback[2])
-    to_state = int(callback[3])
-    menus.torrent_set_files(torrent_id, file_id, bool(to_state))
-    await query.answer()
-    text, reply_markup = menus.get_files(torrent_id)
-    await query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
+    await asyncio.to_thread(menus.torrent_set_files, cb.value, int(cb.arg), bool(int(cb.extra)))
+    _, (text, reply_markup) = await asyncio.gather(query.answer(), asyncio.to_thread(menus.get_files, cb.value))
+    await safe_edit_query(query, text, reply_markup)
 
 
-@utils.whitelist
-async def select_for_download(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def select_for_download(update: Update, context: ContextTypes.DEFAULT_TYPE, cb: CallbackData) -> None:
     query = update.callback_query
-    callback = query.data.split("_")
-    torrent_id = int(callback[1])
-    text, reply_markup = menus.select_files_add_menu(torrent_id)
-    await query.answer()
-    await query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
+    text, reply_markup = await asyncio.to_thread(menus.select_files_add_menu, cb.value)
+    await asyncio.gather(query.answer(), safe_edit_query(query, text, reply_markup))
 
 
-@utils.whitelist
-async def select_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def select_file(update: Update, context: ContextTypes.DEFAULT_TYPE, cb: CallbackData) -> None:
     query = update.callback_query
-    callback = query.data.split("_")
-    torrent_id = int(callback[1])
-    file_id = int(callback[2])
-    to_state = int(callback[3])
-    menus.torrent_set_files(torrent_id, file_id, bool(to_state))
-    await query.answer()
-    text, reply_markup = menus.select_files_add_menu(torrent_id)
-    await query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="MarkdownV2")
+    await asyncio.to_thread(menus.torrent_set_files, cb.value, int(cb.arg), bool(int(cb.extra)))
+    _, (text, reply_markup) = await asyncio.gather(
+        query.answer(), asyncio.to_thread(menus.select_files_add_menu, cb.value)
+    )
+    await safe_edit_query(query, text, reply_markup)
 
 
 async def send_completion_notification(context: ContextTypes.DEFAULT_TYPE, torrent_name: str) -> None:
-    message = f"*{escape_markdown(torrent_name, 2)} downloaded*"
+    message = f"*{utils.escape_md(torrent_name)} downloaded*"
     for chat_id in config.WHITELIST:
         try:
             await context.bot.send_message(
@@ -392,7 +536,7 @@ async def monitor_torrent_completion(context: ContextTypes.DEFAULT_TYPE) -> None
     global _monitor_initialized
 
     try:
-        all_torrents = menus.trans_client.get_torrents()
+        all_torrents = await asyncio.to_thread(menus.list_torrents)
     except Exception:
         logger.exception("Failed to get torrents list for monitoring")
         return
@@ -436,7 +580,7 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = "Something went wrong"
     if update and update.callback_query:
         query = update.callback_query
-        await query.edit_message_text(text=text, parse_mode="MarkdownV2")
+        await safe_edit_query(query, text)
     elif update and update.message:
         await update.message.reply_text(text)
 
@@ -449,10 +593,42 @@ COMMANDS: dict[str, tuple[str | None, utils.Handler]] = {
     "memory": ("Show free disk space", memory),
 }
 
+# callback data command (the part before the first "_") -> handler
+CALLBACK_QUERY_HANDLERS: dict[str, CallbackQueryHandlerFunc] = {
+    "addmenu": torrent_adding,
+    "fileselect": select_file,
+    "selectfiles": select_for_download,
+    "editfile": edit_file,
+    "torrentadd": torrent_adding_actions,
+    "torrentsfiles": torrent_files_inline,
+    "deletemenutorrent": delete_torrent_inline,
+    "deletetorrent": delete_torrent_action_inline,
+    "torrentsgoto": get_torrents_inline,
+    "torrent": torrent_menu_inline,
+}
+
+
+@utils.whitelist
+async def dispatch_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Parses the callback data once and passes it to the handler registered for its command
+    """
+    cb = CallbackData.parse(update.callback_query.data)
+    handler = CALLBACK_QUERY_HANDLERS.get(cb.command)
+    if handler is not None:
+        # updates are processed concurrently, but clicks in one chat must apply in order,
+        # otherwise a slow action can redraw a menu over the one the user has already moved to
+        async with get_chat_lock(context):
+            await handler(update, context, cb)
+
 
 async def post_init(application: Application[ContextTypes.DEFAULT_TYPE]) -> None:  # type: ignore[type-arg]
     from telegram import BotCommand
 
+    await asyncio.to_thread(menus.connect)
+    # dedicated pool for auto-update jobs so they don't compete with handlers for the default one
+    application.bot_data["rpc_executor"] = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rpc")
+
     bot_commands = [BotCommand(name, desc) for name, (desc, _) in COMMANDS.items() if desc]
     await application.bot.set_my_commands(bot_commands)
 
@@ -466,31 +642,75 @@ async def post_init(application: Application[ContextTypes.DEFAULT_TYPE]) -> None
         logger.info(f"Torrent completion monitoring started (interval: {config.NOTIFICATION_CHECK_INTERVAL_SEC}s)")
 
 
-def run() -> None:
-    init_logger(
-        log_level=config.LOG_LEVEL,
-        log_format=config.LOG_FORMAT,
-        log_timestamp_format=config.LOG_TIMESTAMP_FORMAT,
-    )
+async def post_shutdown(application: Application[ContextTypes.DEFAULT_TYPE]) -> None:  # type: ignore[type-arg]
+    executor: ThreadPoolExecutor | None = application.bot_data.pop("rpc_executor", None)
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+    menus.disconnect()
 
-    application = Application.builder().token(config.TOKEN).post_init(post_init).build()
+
+def build_application() -> Application[ContextTypes.DEFAULT_TYPE]:  # type: ignore[type-arg]
+    application = (
+        Application.builder()
+        .token(config.TOKEN)
+        .concurrent_updates(True)
+        # queues requests to stay within Telegram's flood limits and retries on RetryAfter
+        .rate_limiter(AIORateLimiter(max_retries=RATE_LIMITER_MAX_RETRIES))
+        .build()
+    )
 
     for name, (_, handler) in COMMANDS.items():
         application.add_handler(CommandHandler(name, handler))
 
     application.add_error_handler(error_handler)
     application.add_handler(MessageHandler(filters.Document.FileExtension("torrent"), torrent_file_handler))
-    application.add_handler(MessageHandler(filters.Regex(MAGNET_PATTERN), magnet_url_handler))
-    application.add_handler(MessageHandler(filters.Regex(TORRENT_URL_PATTERN), torrent_url_handler))
-    application.add_handler(CallbackQueryHandler(torrent_adding, pattern=r"addmenu_.*"))
-    application.add_handler(CallbackQueryHandler(select_file, pattern=r"fileselect_.*"))
-    application.add_handler(CallbackQueryHandler(select_for_download, pattern=r"selectfiles_.*"))
-    application.add_handler(CallbackQueryHandler(edit_file, pattern=r"editfile_.*"))
-    application.add_handler(CallbackQueryHandler(torrent_adding_actions, pattern=r"torrentadd_.*"))
-    application.add_handler(CallbackQueryHandler(torrent_files_inline, pattern=r"torrentsfiles_.*"))
-    application.add_handler(CallbackQueryHandler(delete_torrent_inline, pattern=r"deletemenutorrent_.*"))
-    application.add_handler(CallbackQueryHandler(delete_torrent_action_inline, pattern=r"deletetorrent_.*"))
-    application.add_handler(CallbackQueryHandler(get_torrents_inline, pattern=r"torrentsgoto_.*"))
-    application.add_handler(CallbackQueryHandler(torrent_menu_inline, pattern=r"torrent_.*"))
-
-    application.run_polling()
+    application.add_handler(MessageHandler(filters.Regex(TORRENT_LINK_PATTERN), text_message_handler))
+    application.add_handler(CallbackQueryHandler(dispatch_callback_query))
+    return application
+
+
+async def start_application(application: Application[ContextTypes.DEFAULT_TYPE]) -> None:  # type: ignore[type-arg]
+    """
+    Starts the bot inside an already running event loop, so it can share the loop with other services
+    """
+    await application.initialize()
+    await post_init(application)
+    await application.updater.start_polling(
+        timeout=LONG_POLLING_TIMEOUT_SEC,
+        allowed_updates=[Update.MESSAGE, Update.CALLBACK_QUERY],
+        drop_pending_updates=True,
+    )
+    await application.start()
+
+
+async def stop_application(application: Application[ContextTypes.DEFAULT_TYPE]) -> None:  # type: ignore[type-arg]
+    if application.updater.running:
+        await application.updater.stop()
+    if application.running:
+        await application.stop()
+    await application.shutdown()
+    await post_shutdown(application)
+
+
+async def run_async() -> None:
+    application = build_application()
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    try:
+        # inside the try, so a failed startup still releases whatever was set up before it
+        await start_application(application)
+        await stop_event.wait()
+    finally:
+        await stop_application(application)
+
+
+def run() -> None:
+    init_logger(
+        log_level=config.LOG_LEVEL,
+        log_format=config.LOG_FORMAT,
+        log_timestamp_format=config.LOG_TIMESTAMP_FORMAT,
+    )
+    asyncio.run(run_async())
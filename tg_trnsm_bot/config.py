@@ -5,7 +5,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 TOKEN = os.environ["TELEGRAM_TOKEN"]
-WHITELIST = [int(i.strip()) for i in os.environ["WHITELIST"].split(",")]
+WHITELIST = frozenset(int(i.strip()) for i in os.environ["WHITELIST"].split(","))
 
 TRANSMISSION_HOST = os.getenv("TRANSMISSION_HOST", "127.0.0.1")
 TRANSMISSION_PORT = int(os.getenv("TRANSMISSION_PORT", "9091"))
@@ -1,142 +1,347 @@
+import contextlib
+import functools
 import logging
+import threading
+import time
+import types
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 import telegram
 import transmission_rpc as trans
-import transmission_rpc.utils as trans_utils
-from telegram.helpers import escape_markdown
 from transmission_rpc.error import TransmissionError
 
 from . import config, utils
 
 logger = logging.getLogger(__name__)
 
-STATUS_LIST = {
-    "downloading": "⏬",
-    "seeding": "✅",
-    "checking": "🔁",
-    "check pending": "📡",
-    "stopped": "⏹️",
-}
-
-trans_client = trans.Client(
-    host=config.TRANSMISSION_HOST,
-    port=config.TRANSMISSION_PORT,
-    username=config.TRANSMISSION_USERNAME,
-    password=config.TRANSMISSION_PASSWORD,
+STATUS_LIST = types.MappingProxyType(
+    {
+        "downloading": "⏬",
+        "seeding": "✅",
+        "checking": "🔁",
+        "check pending": "📡",
+        "stopped": "⏹️",
+    }
+)
+UNKNOWN_STATUS = "❔"
+
+# fields rendered by `torrent_menu`, fetching only them keeps torrent-get responses small
+TORRENT_MENU_FIELDS = (
+    "name",
+    "status",
+    "recheckProgress",
+    "sizeWhenDone",
+    "leftUntilDone",
+    "percentDone",
+    "rateDownload",
+    "rateUpload",
+    "uploadedEver",
+    "eta",
 )
 
+# the torrent list is reused for this long, so bursts of paging clicks cost one torrent-get
+TORRENT_LIST_CACHE_TTL_SEC = 0.25
+# same for a single torrent shown by the files, delete and add menus, and for the free space
+TORRENT_CACHE_TTL_SEC = 1.5
+TORRENT_CACHE_SIZE = 256
+FREE_SPACE_CACHE_TTL_SEC = 5.0
+
+# keyboards are immutable, so the ones depending only on a torrent id are built once and shared
+KEYBOARD_CACHE_SIZE = 1024
+BACK_TO_LIST_BUTTON = telegram.InlineKeyboardButton("⏪ Back", callback_data="torrentsgoto_0")
+
+# constant parts of the list and files menus, escaped once instead of on every render
+FILES_DELIMITER = utils.escape_md("-" * 60 + "\n")
+ESCAPED_NUMBERS = tuple(utils.escape_md(f"{number}. ") for number in range(1, 1025))
+
+# created on first use by `get_client`, so importing the module doesn't talk to Transmission
+_client: trans.Client | None = None
+_client_lock = threading.Lock()
+_client_exit_stack = contextlib.ExitStack()
+# lets a menu needing several independent RPCs wait for them in parallel instead of one by one,
+# lives as long as the client
+_rpc_pool: ThreadPoolExecutor | None = None
+
+_torrent_list_lock = threading.Lock()
+_torrent_list_cache: tuple[float, list[trans.Torrent]] | None = None
+_torrent_cache_lock = threading.Lock()
+# entries are kept in expiry order, so the oldest one is always first
+_torrent_cache: dict[int, tuple[float, trans.Torrent]] = {}
+# bumped by `invalidate_torrent`, a fetch started before any change isn't stored after it
+_torrent_generation = 0
+_free_space_cache: tuple[float, int | None] | None = None
+
+
+def get_client() -> trans.Client:
+    """
+    Returns the Transmission client shared by all menus, its HTTP session is kept until `disconnect`
+    """
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _client_exit_stack.enter_context(
+                    trans.Client(
+                        host=config.TRANSMISSION_HOST,
+                        port=config.TRANSMISSION_PORT,
+                        username=config.TRANSMISSION_USERNAME,
+                        password=config.TRANSMISSION_PASSWORD,
+                    )
+                )
+    return _client
+
+
+def get_rpc_pool() -> ThreadPoolExecutor:
+    global _rpc_pool
+
+    if _rpc_pool is None:
+        with _client_lock:
+            if _rpc_pool is None:
+                _rpc_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="menus-rpc")
+    return _rpc_pool
 
-def get_torrent_status(torrent_id: int) -> str:
-    return trans_client.get_torrent(torrent_id).status
 
+def connect() -> None:
+    """
+    Creates the client up front, so an unreachable Transmission shows up on startup
+    """
+    get_client()
+
+
+def disconnect() -> None:
+    global _client, _rpc_pool
+
+    with _client_lock:
+        if _rpc_pool is not None:
+            _rpc_pool.shutdown(wait=False, cancel_futures=True)
+            _rpc_pool = None
+        _client_exit_stack.close()
+        _client = None
+    get_download_dir.cache_clear()
 
-def start_torrent(torrent_id: int) -> None:
-    trans_client.start_torrent(torrent_id)
 
+def list_torrents() -> list[trans.Torrent]:
+    global _torrent_list_cache
 
-def stop_torrent(torrent_id: int) -> None:
-    trans_client.stop_torrent(torrent_id)
+    with _torrent_list_lock:
+        now = time.monotonic()
+        if _torrent_list_cache is None or _torrent_list_cache[0] <= now:
+            _torrent_list_cache = (now + TORRENT_LIST_CACHE_TTL_SEC, get_client().get_torrents())
+        return _torrent_list_cache[1]
 
 
-def verify_torrent(torrent_id: int) -> None:
-    trans_client.verify_torrent(torrent_id)
+def invalidate_torrent_list() -> None:
+    global _torrent_list_cache
+
+    with _torrent_list_lock:
+        _torrent_list_cache = None
+
+
+def get_cached_torrent(torrent_id: int) -> trans.Torrent:
+    """
+    Returns the torrent with all fields, reusing a fetch made less than TORRENT_CACHE_TTL_SEC ago
+    """
+    with _torrent_cache_lock:
+        cached = _torrent_cache.get(torrent_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        generation = _torrent_generation
+    torrent = get_client().get_torrent(torrent_id)
+    with _torrent_cache_lock:
+        if _torrent_generation != generation:
+            return torrent
+        now = time.monotonic()
+        _torrent_cache.pop(torrent_id, None)
+        _torrent_cache[torrent_id] = (now + TORRENT_CACHE_TTL_SEC, torrent)
+        while _torrent_cache:
+            oldest_id, (expires_at, _) = next(iter(_torrent_cache.items()))
+            if expires_at > now and len(_torrent_cache) <= TORRENT_CACHE_SIZE:
+                break
+            del _torrent_cache[oldest_id]
+    return torrent
+
+
+def invalidate_torrent(torrent_id: int) -> None:
+    global _torrent_generation
+
+    with _torrent_cache_lock:
+        _torrent_cache.pop(torrent_id, None)
+        _torrent_generation += 1
+    invalidate_torrent_list()
+
+
+def get_torrent(torrent_id: int, arguments: Iterable[str] | None = None) -> trans.Torrent:
+    return get_client().get_torrent(torrent_id, arguments=arguments)
+
+
+def fetch_torrents(torrent_ids: list[int], arguments: Iterable[str] | None = None) -> list[trans.Torrent]:
+    return get_client().get_torrents(torrent_ids, arguments=arguments)
+
+
+def start_torrent(torrent_id: int) -> trans.Torrent:
+    get_client().start_torrent(torrent_id)
+    invalidate_torrent(torrent_id)
+    return get_client().get_torrent(torrent_id, arguments=TORRENT_MENU_FIELDS)
+
+
+def stop_torrent(torrent_id: int) -> trans.Torrent:
+    get_client().stop_torrent(torrent_id)
+    invalidate_torrent(torrent_id)
+    return get_client().get_torrent(torrent_id, arguments=TORRENT_MENU_FIELDS)
+
+
+def verify_torrent(torrent_id: int) -> trans.Torrent:
+    get_client().verify_torrent(torrent_id)
+    invalidate_torrent(torrent_id)
+    return get_client().get_torrent(torrent_id, arguments=TORRENT_MENU_FIELDS)
 
 
 def delete_torrent(torrent_id: int, data: bool = False) -> None:
-    trans_client.remove_torrent(torrent_id, delete_data=data)
+    get_client().remove_torrent(torrent_id, delete_data=data)
+    invalidate_torrent(torrent_id)
 
 
 def torrent_set_files(torrent_id: int, file_id: int, state: bool) -> None:
     if state:
-        trans_client.change_torrent(ids=torrent_id, files_wanted=[file_id])
+        get_client().change_torrent(ids=torrent_id, files_wanted=[file_id])
     else:
-        trans_client.change_torrent(ids=torrent_id, files_unwanted=[file_id])
+        get_client().change_torrent(ids=torrent_id, files_unwanted=[file_id])
+    invalidate_torrent(torrent_id)
 
 
-def add_torrent_with_file(file: bytes | bytearray) -> trans.Torrent:
-    return trans_client.add_torrent(bytes(file), paused=True)
+def add_torrent_with_file(path: Path) -> trans.Torrent:
+    torrent = get_client().add_torrent(path, paused=True)
+    invalidate_torrent_list()
+    return torrent
 
 
 def add_torrent_with_magnet(url: str) -> trans.Torrent:
-    return trans_client.add_torrent(url, paused=True)
+    torrent = get_client().add_torrent(url, paused=True)
+    invalidate_torrent_list()
+    return torrent
 
 
 def add_torrent_with_url(url: str) -> trans.Torrent:
-    return trans_client.add_torrent(url, paused=True)
+    torrent = get_client().add_torrent(url, paused=True)
+    invalidate_torrent_list()
+    return torrent
+
+
+MENU_TEXT = "Commands:\n/add - add torrent\n/torrents - list all torrents\n/memory - available memory"
+ADD_TORRENT_TEXT = "Just send me torrent file, magnet url or link to torrent file"
 
 
 def menu() -> str:
-    text = "Commands:\n/add - add torrent\n/torrents - list all torrents\n/memory - available memory"
-    return text
+    return MENU_TEXT
 
 
 def add_torrent() -> str:
-    return "Just send me torrent file, magnet url or link to torrent file"
+    return ADD_TORRENT_TEXT
 
 
-def get_memory() -> str:
-    size_in_bytes = None
+@functools.cache
+def get_download_dir() -> str:
+    """
+    Returns the download dir from the session, it isn't expected to change while the bot is running
+    """
+    return get_client().get_session().download_dir
+
+
+def get_free_space() -> int | None:
+    global _free_space_cache
+
+    now = time.monotonic()
+    if _free_space_cache is not None and _free_space_cache[0] > now:
+        return _free_space_cache[1]
     try:
-        size_in_bytes = trans_client.free_space(trans_client.get_session().download_dir)
+        size_in_bytes = get_client().free_space(get_download_dir())
     except TransmissionError:
         logger.exception("Failed to get free space")
+        # the dir may have been changed in Transmission settings, so it's fetched again next time
+        get_download_dir.cache_clear()
+        return None
+    _free_space_cache = (now + FREE_SPACE_CACHE_TTL_SEC, size_in_bytes)
+    return size_in_bytes
 
-    if size_in_bytes is None:
-        size, unit = "unknown", ""
-    else:
-        _size, unit = trans_utils.format_size(size_in_bytes)
-        size = str(round(_size, 2))
 
-    return f"Free disk space: {size} {unit}"
+def get_memory() -> str:
+    size_in_bytes = get_free_space()
+
+    if size_in_bytes is None:
+        return "Free disk space: unknown"
+    return f"Free disk space: {utils.format_size(size_in_bytes, 2)}"
 
 
 def torrent_menu(
-    torrent_id: int, auto_refresh_remaining: int | None = None
+    torrent_id: int,
+    auto_refresh_remaining: int | None = None,
+    torrent: trans.Torrent | None = None,
 ) -> tuple[str, telegram.InlineKeyboardMarkup]:
-    torrent = trans_client.get_torrent(torrent_id)
-    text = f"*{escape_markdown(torrent.name, 2)}*\n"
-
-    status = torrent.status
-    if status == "checking":
-        percent = round(torrent.recheck_progress * 100, 1)
-        status_line = f"Checking {percent}%"
-    elif status == "check pending":
-        status_line = "Check pending"
-    elif status == "stopped":
-        downloaded_bytes = torrent.size_when_done - torrent.left_until_done
-        downloaded = trans_utils.format_size(downloaded_bytes)
-        total = trans_utils.format_size(torrent.size_when_done)
-        percent = round(torrent.progress, 1)
-        status_line = (
-            f"Stopped {round(downloaded[0], 1)} {downloaded[1]} of {round(total[0], 1)} {total[1]} ({percent}%)"
-        )
-    elif status == "seeding":
-        total = trans_utils.format_size(torrent.size_when_done)
-        ul_speed = trans_utils.format_speed(torrent.rate_upload)
-        uploaded = trans_utils.format_size(torrent.uploaded_ever)
-        status_line = (
-            f"Seeding {round(total[0], 1)} {total[1]} ↑ {round(ul_speed[0], 1)} {ul_speed[1]} "
-            f"({round(uploaded[0], 1)} {uploaded[1]})"
-        )
-    else:
-        downloaded_bytes = torrent.size_when_done - torrent.left_until_done
-        downloaded = trans_utils.format_size(downloaded_bytes)
-        total = trans_utils.format_size(torrent.size_when_done)
-        percent = round(torrent.progress, 1)
-        dl_speed = trans_utils.format_speed(torrent.rate_download)
-        ul_speed = trans_utils.format_speed(torrent.rate_upload)
-        uploaded = trans_utils.format_size(torrent.uploaded_ever)
-        eta = utils.formated_eta(torrent)
-        status_line = (
-            f"Downloading {round(downloaded[0], 1)} {downloaded[1]} of {round(total[0], 1)} {total[1]} ({percent}%)\n"
-            f"↓ {round(dl_speed[0], 1)} {dl_speed[1]} ↑ {round(ul_speed[0], 1)} {ul_speed[1]} "
-            f"({round(uploaded[0], 1)} {uploaded[1]})"
-        )
-        if eta != "Unavailable":
-            status_line = f"{status_line} - {eta}"
+    if torrent is None:
+        torrent = get_client().get_torrent(torrent_id, arguments=TORRENT_MENU_FIELDS)
+    text = torrent_menu_text(torrent)
+    reply_markup = torrent_menu_keyboard(torrent_id, torrent.status == "stopped", auto_refresh_remaining)
+    return text, reply_markup
+
+
+def format_checking_status(torrent: trans.Torrent) -> str:
+    return f"Checking {round(torrent.recheck_progress * 100, 1)}%"
+
+
+def format_check_pending_status(torrent: trans.Torrent) -> str:
+    return "Check pending"
+
+
+def format_stopped_status(torrent: trans.Torrent) -> str:
+    downloaded = utils.format_size(torrent.size_when_done - torrent.left_until_done)
+    total = utils.format_size(torrent.size_when_done)
+    return f"Stopped {downloaded} of {total} ({round(torrent.progress, 1)}%)"
+
 
-    text += escape_markdown(status_line, 2) + "\n"
-    if torrent.status == "stopped":
+def format_seeding_status(torrent: trans.Torrent) -> str:
+    total = utils.format_size(torrent.size_when_done)
+    ul_speed = utils.format_speed(torrent.rate_upload)
+    uploaded = utils.format_size(torrent.uploaded_ever)
+    return f"Seeding {total} ↑ {ul_speed} ({uploaded})"
+
+
+def format_downloading_status(torrent: trans.Torrent) -> str:
+    downloaded = utils.format_size(torrent.size_when_done - torrent.left_until_done)
+    total = utils.format_size(torrent.size_when_done)
+    dl_speed = utils.format_speed(torrent.rate_download)
+    ul_speed = utils.format_speed(torrent.rate_upload)
+    uploaded = utils.format_size(torrent.uploaded_ever)
+    status_line = (
+        f"Downloading {downloaded} of {total} ({round(torrent.progress, 1)}%)\n↓ {dl_speed} ↑ {ul_speed} ({uploaded})"
+    )
+    eta = utils.formated_eta(torrent)
+    if eta is not None:
+        status_line = f"{status_line} - {eta}"
+    return status_line
+
+
+# torrent status -> status line of the torrent menu, any other status is shown as downloading
+STATUS_LINE_FORMATTERS: dict[str, Callable[[trans.Torrent], str]] = {
+    "checking": format_checking_status,
+    "check pending": format_check_pending_status,
+    "stopped": format_stopped_status,
+    "seeding": format_seeding_status,
+}
+
+
+def torrent_menu_text(torrent: trans.Torrent) -> str:
+    status_line = STATUS_LINE_FORMATTERS.get(torrent.status, format_downloading_status)(torrent)
+    return f"*{utils.escape_md(torrent.name)}*\n{utils.escape_md(status_line)}\n"
+
+
+@functools.lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def torrent_menu_keyboard(
+    torrent_id: int, is_stopped: bool, auto_refresh_remaining: int | None
+) -> telegram.InlineKeyboardMarkup:
+    if is_stopped:
         start_stop = telegram.InlineKeyboardButton(
             "▶️ Start",
             callback_data=f"torrent_{torrent_id}_start",
@@ -146,7 +351,7 @@ def torrent_menu(
             "⏹️ Stop",
             callback_data=f"torrent_{torrent_id}_stop",
         )
-    reply_markup = telegram.InlineKeyboardMarkup(
+    return telegram.InlineKeyboardMarkup(
         [
             [
                 start_stop,
@@ -171,90 +376,102 @@ def torrent_menu(
                     callback_data=f"torrent_{torrent_id}_reload",
                 ),
             ],
-            [
-                telegram.InlineKeyboardButton(
-                    "⏪ Back",
-                    callback_data="torrentsgoto_0",
-                )
-            ],
+            [BACK_TO_LIST_BUTTON],
         ]
     )
-    return text, reply_markup
 
 
-def get_files(torrent_id: int) -> tuple[str, telegram.InlineKeyboardMarkup]:
+def escaped_number(index: int) -> str:
+    """
+    Returns the escaped `N. ` prefix for the item with the given zero-based index
+    """
+    if index < len(ESCAPED_NUMBERS):
+        return ESCAPED_NUMBERS[index]
+    return utils.escape_md(f"{index + 1}. ")
+
+
+def size_to_download(torrent: trans.Torrent) -> str:
+    size_when_done = utils.format_size(torrent.size_when_done, 2)
+    total_size = utils.format_size(torrent.total_size, 2)
+    return f"Size to download: {size_when_done} / {total_size}"
+
+
+def _render_files_menu(
+    torrent_id: int,
+    callback_prefix: str,
+    show_progress: bool,
+    control_rows: Sequence[Sequence[telegram.InlineKeyboardButton]],
+) -> tuple[str, telegram.InlineKeyboardMarkup]:
+    """
+    Renders the file list of a torrent with a toggle button per file, shared by the files and select files menus
+    """
     max_line_len = 100
     keyboard_width = 5
-    torrent = trans_client.get_torrent(torrent_id)
+    torrent = get_cached_torrent(torrent_id)
     if len(torrent.name) >= max_line_len:
         name = f"{torrent.name[:max_line_len]}.."
     else:
         name = torrent.name
-    text = f"*{escape_markdown(name, 2)}*\n"
-    text += "Files:\n"
-    column = 0
-    row = 0
-    file_keyboard: list[list[telegram.InlineKeyboardButton]] = [[]]
-    for file_id, file in enumerate(torrent.get_files()):
+    parts = [f"*{utils.escape_md(name)}*\n", "Files:\n"]
+    files = torrent.get_files()
+    file_keyboard: list[list[telegram.InlineKeyboardButton]] = [
+        [] for _ in range((len(files) + keyboard_width - 1) // keyboard_width)
+    ]
+    for file_id, file in enumerate(files):
         raw_name = file.name.split("/")
         filename = raw_name[1] if len(raw_name) == 2 else file.name
         if len(filename) >= max_line_len:
             filename = f"{filename[:max_line_len]}.."
-        file_num = escape_markdown(f"{file_id + 1}. ", 2)
-        file_size_raw = trans_utils.format_size(file.size)
-        file_completed_raw = trans_utils.format_size(file.completed)
-        file_size = escape_markdown(
-            f"{round(file_completed_raw[0], 2)} {file_completed_raw[1]}"
-            f" / {round(file_size_raw[0], 2)} {file_size_raw[1]}",
-            2,
-        )
-        file_progress = escape_markdown(f"{round(utils.file_progress(file), 1)}%", 2)
-        if column >= keyboard_width:
-            file_keyboard.append([])
-            column = 0
-            row += 1
+        file_num = escaped_number(file_id)
+        filename = utils.escape_md(filename)
+        if show_progress:
+            file_size = utils.escape_md(f"{utils.format_size(file.completed, 2)} / {utils.format_size(file.size, 2)}")
+            file_progress = utils.escape_md(f"{round(utils.file_progress(file), 1)}%")
+            details = f"\nSize: {file_size} {file_progress}\n"
+        else:
+            file_size = utils.escape_md(utils.format_size(file.size, 2))
+            details = f"  {file_size}\n"
         if file.selected:
-            filename = escape_markdown(filename, 2, "PRE")
-            text += f"*{file_num}*`{filename}`\n"
+            parts.append(f"*{file_num}*`{filename}`{details}")
             button = telegram.InlineKeyboardButton(
                 f"{file_id + 1}. ✅",
-                callback_data=f"editfile_{torrent_id}_{file_id}_0",
+                callback_data=f"{callback_prefix}_{torrent_id}_{file_id}_0",
             )
         else:
-            filename = escape_markdown(filename, 2)
-            text += f"*{file_num}*~{filename}~\n"
+            parts.append(f"*{file_num}*~{filename}~{details}")
             button = telegram.InlineKeyboardButton(
                 f"{file_id + 1}. ❌",
-                callback_data=f"editfile_{torrent_id}_{file_id}_1",
+                callback_data=f"{callback_prefix}_{torrent_id}_{file_id}_1",
             )
-        text += f"Size: {file_size} {file_progress}\n"
-        column += 1
-        file_keyboard[row].append(button)
-    delimiter = "".join("-" for _ in range(60))
-    text += escape_markdown(f"{delimiter}\n", 2)
-    total_size = trans_utils.format_size(torrent.total_size)
-    size_when_done = trans_utils.format_size(torrent.size_when_done)
-    text += escape_markdown(
-        f"Size to download: {round(size_when_done[0], 2)} {size_when_done[1]}"
-        f" / {round(total_size[0], 2)} {total_size[1]}",
-        2,
-    )
-    control_buttons = [
-        [
+        file_keyboard[file_id // keyboard_width].append(button)
+    if show_progress:
+        parts.append(FILES_DELIMITER)
+    parts.append(utils.escape_md(size_to_download(torrent)))
+    text = "".join(parts)
+    reply_markup = telegram.InlineKeyboardMarkup([*file_keyboard, *control_rows])
+    return text, reply_markup
+
+
+def get_files(torrent_id: int) -> tuple[str, telegram.InlineKeyboardMarkup]:
+    return _render_files_menu(torrent_id, "editfile", True, files_menu_control_rows(torrent_id))
+
+
+@functools.lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def files_menu_control_rows(torrent_id: int) -> tuple[tuple[telegram.InlineKeyboardButton, ...], ...]:
+    return (
+        (
             telegram.InlineKeyboardButton(
                 "🔄 Reload",
                 callback_data=f"torrentsfiles_{torrent_id}_reload",
-            )
-        ],
-        [
+            ),
+        ),
+        (
             telegram.InlineKeyboardButton(
                 "⏪ Back",
                 callback_data=f"torrent_{torrent_id}",
-            )
-        ],
-    ]
-    reply_markup = telegram.InlineKeyboardMarkup(file_keyboard + control_buttons)
-    return text, reply_markup
+            ),
+        ),
+    )
 
 
 def get_torrents(start_point: int = 0) -> tuple[str, telegram.InlineKeyboardMarkup]:
@@ -264,88 +481,69 @@ def get_torrents(start_point: int = 0) -> tuple[str, telegram.InlineKeyboardMark
     max_line_len = 30
     keyboard_width = 5
     page_size = 15
-    torrents = trans_client.get_torrents()
-    torrents_count = 1
-    start_point = start_point if torrents[start_point:] else 0
-    count = start_point
-    keyboard: list[list[telegram.InlineKeyboardButton]] = [[]]
-    column = 0
-    row = 0
-    torrent_list = ""
-    for torrent in torrents[start_point:]:
-        if torrents_count <= page_size:
-            if len(torrent.name) >= max_line_len:
-                name = f"{torrent.name[:max_line_len]}.."
-            else:
-                name = torrent.name
-            name = escape_markdown(name, 2)
-            number = escape_markdown(f"{count + 1}. ", 2)
-            torrent_list += f"*{number}* {STATUS_LIST[torrent.status]} {name}\n"
-            if column >= keyboard_width:
-                keyboard.append([])
-                column = 0
-                row += 1
-            keyboard[row].append(telegram.InlineKeyboardButton(f"{count + 1}", callback_data=f"torrent_{torrent.id}"))
-            column += 1
-            count += 1
-            torrents_count += 1
+    torrents = list_torrents()
+    if not 0 <= start_point < len(torrents):
+        start_point = 0
+    page = torrents[start_point : start_point + page_size]
+    has_next = len(torrents) > start_point + page_size
+    keyboard: list[list[telegram.InlineKeyboardButton]] = [
+        [] for _ in range((len(page) + keyboard_width - 1) // keyboard_width)
+    ]
+    parts: list[str] = []
+    status_get = STATUS_LIST.get
+    for i, torrent in enumerate(page):
+        if len(torrent.name) >= max_line_len:
+            name = f"{torrent.name[:max_line_len]}.."
         else:
-            keyboard.append([])
-            row += 1
-            keyboard[row].append(
-                telegram.InlineKeyboardButton(
-                    "🔄 Reload",
-                    callback_data=f"torrentsgoto_{start_point}_reload",
-                )
-            )
-            keyboard.append([])
-            row += 1
-            if start_point:
-                keyboard[row].append(
-                    telegram.InlineKeyboardButton(
-                        "⏪ Back",
-                        callback_data=f"torrentsgoto_{start_point - page_size}",
-                    )
-                )
-            keyboard[row].append(
-                telegram.InlineKeyboardButton(
-                    "Next ⏩",
-                    callback_data=f"torrentsgoto_{count}",
-                )
-            )
-            break
-    else:
-        keyboard.append([])
-        row += 1
-        keyboard[row].append(
+            name = torrent.name
+        name = utils.escape_md(name)
+        number = escaped_number(start_point + i)
+        parts.append(f"*{number}* {status_get(torrent.status, UNKNOWN_STATUS)} {name}\n")
+        keyboard[i // keyboard_width].append(
+            telegram.InlineKeyboardButton(f"{start_point + i + 1}", callback_data=f"torrent_{torrent.id}")
+        )
+    keyboard.append(
+        [
             telegram.InlineKeyboardButton(
                 "🔄 Reload",
                 callback_data=f"torrentsgoto_{start_point}_reload",
             )
+        ]
+    )
+    nav_row = []
+    if start_point:
+        nav_row.append(
+            telegram.InlineKeyboardButton(
+                "⏪ Back",
+                callback_data=f"torrentsgoto_{start_point - page_size}",
+            )
         )
-        keyboard.append([])
-        row += 1
-        if start_point and torrent_list:
-            keyboard[row].append(
-                telegram.InlineKeyboardButton(
-                    "⏪ Back",
-                    callback_data=f"torrentsgoto_{start_point - page_size}",
-                )
+    if has_next:
+        nav_row.append(
+            telegram.InlineKeyboardButton(
+                "Next ⏩",
+                callback_data=f"torrentsgoto_{start_point + page_size}",
             )
+        )
+    keyboard.append(nav_row)
     reply_markup = telegram.InlineKeyboardMarkup(keyboard)
-    if not torrent_list:
-        torrent_list = "Nothing to display"
+    torrent_list = "".join(parts) or "Nothing to display"
     return torrent_list, reply_markup
 
 
 def delete_menu(torrent_id: int) -> tuple[str, telegram.InlineKeyboardMarkup]:
-    torrent = trans_client.get_torrent(torrent_id)
+    torrent = get_cached_torrent(torrent_id)
     text = (
         "⚠️Do you really want to delete this torrent?⚠️\n"
         f"{torrent.name}\n"
         "You also can delete torrent with all downloaded data."
     )
-    reply_markup = telegram.InlineKeyboardMarkup(
+    return text, delete_menu_keyboard(torrent_id)
+
+
+@functools.lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def delete_menu_keyboard(torrent_id: int) -> telegram.InlineKeyboardMarkup:
+    return telegram.InlineKeyboardMarkup(
         [
             [
                 telegram.InlineKeyboardButton(
@@ -367,21 +565,19 @@ def delete_menu(torrent_id: int) -> tuple[str, telegram.InlineKeyboardMarkup]:
             ],
         ]
     )
-    return text, reply_markup
 
 
 def add_menu(torrent_id: int) -> tuple[str, telegram.InlineKeyboardMarkup]:
-    torrent = trans_client.get_torrent(torrent_id)
-    text = f"*{escape_markdown(torrent.name, 2)}*\n"
-    total_size = trans_utils.format_size(torrent.total_size)
-    size_when_done = trans_utils.format_size(torrent.size_when_done)
-    raw_text = (
-        f"Size to download: {round(size_when_done[0], 2)} {size_when_done[1]}"
-        f" / {round(total_size[0], 2)} {total_size[1]}\n"
-        f"{get_memory()}\n"
-    )
-    text += escape_markdown(raw_text, 2)
-    reply_markup = telegram.InlineKeyboardMarkup(
+    memory = get_rpc_pool().submit(get_memory)
+    torrent = get_cached_torrent(torrent_id)
+    raw_text = f"{size_to_download(torrent)}\n{memory.result()}\n"
+    text = f"*{utils.escape_md(torrent.name)}*\n{utils.escape_md(raw_text)}"
+    return text, add_menu_keyboard(torrent_id)
+
+
+@functools.lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def add_menu_keyboard(torrent_id: int) -> telegram.InlineKeyboardMarkup:
+    return telegram.InlineKeyboardMarkup(
         [
             [
                 telegram.InlineKeyboardButton(
@@ -401,63 +597,17 @@ def add_menu(torrent_id: int) -> tuple[str, telegram.InlineKeyboardMarkup]:
             ],
         ]
     )
-    return text, reply_markup
 
 
 def select_files_add_menu(torrent_id: int) -> tuple[str, telegram.InlineKeyboardMarkup]:
-    max_line_len = 100
-    keyboard_width = 5
-    torrent = trans_client.get_torrent(torrent_id)
-    if len(torrent.name) >= max_line_len:
-        name = f"{torrent.name[:max_line_len]}.."
-    else:
-        name = torrent.name
-    text = f"*{escape_markdown(name, 2)}*\n"
-    text += "Files:\n"
-    column = 0
-    row = 0
-    file_keyboard: list[list[telegram.InlineKeyboardButton]] = [[]]
-    for file_id, file in enumerate(torrent.get_files()):
-        raw_name = file.name.split("/")
-        filename = raw_name[1] if len(raw_name) == 2 else file.name
-        if len(filename) >= max_line_len:
-            filename = f"{filename[:max_line_len]}.."
-        file_num = escape_markdown(f"{file_id + 1}. ", 2)
-        filename = escape_markdown(filename, 2, "PRE")
-        file_size_raw = trans_utils.format_size(file.size)
-        file_size = escape_markdown(f"{round(file_size_raw[0], 2)} {file_size_raw[1]}", 2)
-        if column >= keyboard_width:
-            file_keyboard.append([])
-            column = 0
-            row += 1
-        if file.selected:
-            text += f"*{file_num}*`{filename}`  {file_size}\n"
-            button = telegram.InlineKeyboardButton(
-                f"{file_id + 1}. ✅",
-                callback_data=f"fileselect_{torrent_id}_{file_id}_0",
-            )
-        else:
-            text += f"*{file_num}*~{filename}~  {file_size}\n"
-            button = telegram.InlineKeyboardButton(
-                f"{file_id + 1}. ❌",
-                callback_data=f"fileselect_{torrent_id}_{file_id}_1",
-            )
-        column += 1
-        file_keyboard[row].append(button)
-    total_size = trans_utils.format_size(torrent.total_size)
-    size_when_done = trans_utils.format_size(torrent.size_when_done)
-    text += escape_markdown(
-        f"Size to download: {round(size_when_done[0], 2)} {size_when_done[1]}"
-        f" / {round(total_size[0], 2)} {total_size[1]}",
-        2,
+    return _render_files_menu(torrent_id, "fileselect", False, (select_files_back_row(torrent_id),))
+
+
+@functools.lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def select_files_back_row(torrent_id: int) -> tuple[telegram.InlineKeyboardButton, ...]:
+    return (
+        telegram.InlineKeyboardButton(
+            "⏪ Back",
+            callback_data=f"addmenu_{torrent_id}",
+        ),
     )
-    control_buttons = [
-        [
-            telegram.InlineKeyboardButton(
-                "⏪ Back",
-                callback_data=f"addmenu_{torrent_id}",
-            )
-        ],
-    ]
-    reply_markup = telegram.InlineKeyboardMarkup(file_keyboard + control_buttons)
-    return text, reply_markup
@@ -1,9 +1,10 @@
 import logging
 from collections.abc import Awaitable, Callable
-from functools import wraps
+from functools import lru_cache, wraps
 from typing import Any
 
 import transmission_rpc as trans
+import transmission_rpc.utils as trans_utils
 from telegram import Update
 from telegram.ext import ContextTypes
 
@@ -13,24 +14,49 @@ logger = logging.getLogger(__name__)
 
 Handler = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[Any]]
 
+SIZE_FORMAT_CACHE_SIZE = 4096
 
-def formated_eta(torrent: trans.Torrent) -> str:
+MARKDOWN_V2_ESCAPE_TABLE = str.maketrans({char: f"\\{char}" for char in r"\_*[]()~`>#+-=|{}.!"})
+
+
+def escape_md(text: str) -> str:
+    """
+    Escapes MarkdownV2 special characters in a single pass
+    """
+    return text.translate(MARKDOWN_V2_ESCAPE_TABLE)
+
+
+@lru_cache(maxsize=SIZE_FORMAT_CACHE_SIZE)
+def format_size(size_in_bytes: int, ndigits: int = 1) -> str:
+    """
+    Formats a byte count as `<value rounded to ndigits> <unit>`
+    """
+    size, unit = trans_utils.format_size(size_in_bytes)
+    return f"{round(size, ndigits)} {unit}"
+
+
+@lru_cache(maxsize=SIZE_FORMAT_CACHE_SIZE)
+def format_speed(bytes_per_second: int) -> str:
+    speed, unit = trans_utils.format_speed(bytes_per_second)
+    return f"{round(speed, 1)} {unit}"
+
+
+def formated_eta(torrent: trans.Torrent) -> str | None:
+    """
+    Returns None when Transmission can't estimate the time left
+    """
     try:
         eta = torrent.eta
     except ValueError:
-        return "Unavailable"
+        return None
     if eta is None:
-        return "Unavailable"
-    minutes, seconds = divmod(eta.seconds, 60)
-    hours, minutes = divmod(minutes, 60)
-    text = ""
-    if eta.days:
-        text += f"{eta.days} days "
+        return None
+    hours, rem = divmod(eta.seconds, 3600)
+    minutes, seconds = divmod(rem, 60)
+    days = f"{eta.days} days " if eta.days else ""
     if hours:
-        text += f"{hours} h {minutes} min"
-    else:
-        text += f"{minutes} min {seconds} sec"
-    return text
+        return f"{days}{hours} h {minutes} min"
+    return f"{days}{minutes} min {seconds} sec"
 
 
 def file_progress(file: trans.File) -> float:
@@ -43,11 +69,13 @@ def file_progress(file: trans.File) -> float:
 
 
 def whitelist(func: Handler) -> Handler:
+    allowed_users = config.WHITELIST
+
     @wraps(func)
     async def wrapped(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Any:
-        user_id: int = update.effective_user.id
-        if user_id not in config.WHITELIST:
-            logger.warning(f"Unauthorized access denied for {user_id}.")
+        user = update.effective_user
+        if user is None or user.id not in allowed_users:
+            logger.warning(f"Unauthorized access denied for {user.id if user else None}.")
             return
         return await func(update, context)
 